@@ -4,16 +4,25 @@ Generate graphs from cross-language JavaScript parser benchmarks.
 Creates comparison bar charts for parsing time and throughput across all parsers.
 """
 
+import argparse
+import mmap
+import pickle
 import re
 import sys
 import os
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, suppress
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 from dataclasses import dataclass
 
 try:
+    import matplotlib
+    matplotlib.use('Agg')
     import matplotlib.pyplot as plt
-    import matplotlib.patches as mpatches
+    from matplotlib.figure import Figure
     import numpy as np
 except ImportError:
     print("Error: matplotlib and numpy are required. Install with:")
@@ -21,7 +30,59 @@ except ImportError:
     sys.exit(1)
 
 
-@dataclass
+# Rank indicators that prefix each parser result line (UTF-8, as the files are scanned as bytes)
+_MEDALS = tuple(m.encode() for m in ('🥇', '🥈', '🥉'))
+_MEDAL_PATTERN = b'(?:' + b'|'.join(_MEDALS) + b')'
+
+# Read buffer for result files that cannot be memory-mapped
+_READ_BUFFER_SIZE = 1 << 20
+
+# Stored with every cached parse. Bump whenever parsing behavior changes - the parse_*_results
+# functions, the result patterns, their helpers or library name normalization - so old
+# entries are re-parsed instead of served stale.
+_CACHE_VERSION = 2
+
+# Resolution of the saved PNGs, overridable with --dpi
+_DEFAULT_DPI = 110
+
+# Bar colors by language, used for parsers without their own color
+_LANGUAGE_COLORS: Dict[str, str] = {
+    'Rust': '#dea584',      # Rust orange
+    'JavaScript': '#f7df1e', # JS yellow
+    'Java': '#5382a1',       # Java blue
+}
+
+# Bar colors by parser
+_PARSER_COLORS: Dict[str, str] = {
+    # Rust parsers - orange tones
+    'OXC': '#e07020',
+    'SWC': '#ff9955',
+    # JavaScript parsers - yellow/green tones
+    'Meriyah': '#2d9f2d',
+    'Acorn': '#7cb342',
+    '@babel/parser': '#f5da55',
+    # Java parsers - blue tones
+    'Harmonica': '#1e88e5',
+}
+
+# Libraries ordered by size (smallest to largest)
+_LIBRARY_ORDER = ['React', 'Vue 3', 'React DOM', 'Lodash', 'Three.js', 'TypeScript Compiler']
+
+# Grouped bar chart layout: one x slot per library, bars of this width side by side
+_X_POSITIONS = np.arange(len(_LIBRARY_ORDER))
+_BAR_WIDTH = 0.12
+
+# Library section header shared by all result files
+_LIB_RE = re.compile(rb'Library: (.+?)\r?\nSize: ([\d.]+) KB')
+# Match Java results like: 🥇 Our Java Parser    |         123.456 |                100.0
+_JAVA_RESULT_RE = re.compile(rb'Our Java Parser\s+\|\s+([\d.]+)\s+\|\s+([\d.]+)')
+# Match parser results like: 🥇 Meriyah            |           0.295 |            1.00x |         35.5 KB/ms
+_JS_RESULT_RE = re.compile(_MEDAL_PATTERN + rb'\s+(\S+)\s+\|\s+([\d.]+)\s+\|\s+[\d.]+x\s+\|\s+([\d.]+)\s+KB/ms')
+# Match parser results like: 🥇 OXC (Rust)         |           0.138 |            1.00x |                 76.2
+_RUST_RESULT_RE = re.compile(_MEDAL_PATTERN + rb'\s+(.+?)\s+\|\s+([\d.]+)\s+\|\s+[\d.]+x\s+\|\s+([\d.]+)')
+
+
+@dataclass(slots=True)
 class BenchmarkResult:
     parser: str
     language: str  # 'Java', 'JavaScript', 'Rust'
@@ -29,82 +90,133 @@ class BenchmarkResult:
     throughput_kb_ms: float
 
 
-@dataclass
+@dataclass(slots=True)
 class LibraryBenchmark:
     name: str
     size_kb: float
     results: List[BenchmarkResult]
 
 
-def parse_java_results(filepath: str) -> Dict[str, List[BenchmarkResult]]:
-    """Parse Java benchmark results file."""
-    results = {}
-    current_library = None
+@dataclass
+class ChartContext:
+    libraries: List[str]
+    parsers: List[str]
+    parser_language: Dict[str, str]
+    pivot: Dict[Tuple[str, str], BenchmarkResult]
+    x: np.ndarray
+    xticks: np.ndarray
+
+
+@contextmanager
+def _map_results_file(filepath: str) -> Iterator[Optional[Union[mmap.mmap, bytes]]]:
+    """Memory-map a results file read-only. Yields None if the file is missing or empty.
 
+    Falls back to reading the whole file through a 1 MiB buffer where it cannot be mapped.
+    """
     try:
-        with open(filepath, 'r') as f:
-            content = f.read()
+        f = open(filepath, 'rb', buffering=_READ_BUFFER_SIZE)
     except FileNotFoundError:
-        return results
+        yield None
+        return
 
-    # Find each library section
-    library_pattern = r'Library: (.+?)\nSize: ([\d.]+) KB'
-    result_pattern = r'Our Java Parser\s+\|\s+([\d.]+)\s+\|\s+([\d.]+)'
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            buf = None
+        else:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                buf = f.read()
 
-    for match in re.finditer(library_pattern, content):
-        lib_name = match.group(1).strip()
-        lib_size = float(match.group(2))
+    try:
+        yield buf
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
 
-        # Find the result after this library header
-        remaining = content[match.end():]
-        result_match = re.search(result_pattern, remaining)
 
-        if result_match:
-            avg_time = float(result_match.group(1))
-            throughput = float(result_match.group(2))
+def _iter_lines(content: Union[mmap.mmap, bytes]) -> Iterator[bytes]:
+    """Iterate over the lines of a mapped or fully read results file."""
+    if isinstance(content, mmap.mmap):
+        return iter(content.readline, b'')
+    return iter(content.splitlines(keepends=True))
 
-            results[lib_name] = [BenchmarkResult(
-                parser="Harmonica",
-                language="Java",
-                avg_time_ms=avg_time,
-                throughput_kb_ms=throughput
-            )]
 
-    return results
+def _iter_library_sections(content: Union[mmap.mmap, bytes]) -> Iterator[Tuple[str, int, int]]:
+    """Yield (library name, start, end) offsets of each library section, in one pass over the headers."""
+    previous = None
+    for match in _LIB_RE.finditer(content):
+        if previous is not None:
+            yield previous.group(1).strip().decode(), previous.end(), match.start()
+        previous = match
 
+    if previous is not None:
+        yield previous.group(1).strip().decode(), previous.end(), len(content)
 
-def parse_javascript_results(filepath: str) -> Dict[str, List[BenchmarkResult]]:
-    """Parse JavaScript benchmark results file."""
+
+def parse_java_results(filepath: str) -> Dict[str, List[BenchmarkResult]]:
+    """Parse Java benchmark results file."""
     results = {}
 
-    try:
-        with open(filepath, 'r') as f:
-            content = f.read()
-    except FileNotFoundError:
-        return results
+    with _map_results_file(filepath) as content:
+        if content is None:
+            return results
+
+        for lib_name, start, end in _iter_library_sections(content):
+            # Only look inside this library's section, up to the next header
+            result_match = _JAVA_RESULT_RE.search(content, start, end)
+
+            if result_match:
+                avg_time = float(result_match.group(1))
+                throughput = float(result_match.group(2))
 
-    # Find each library section - library name followed by results
-    library_pattern = r'Library: (.+?)\nSize: ([\d.]+) KB'
-    # Match parser results like: 🥇 Meriyah            |           0.295 |            1.00x |         35.5 KB/ms
-    result_pattern = r'[🥇🥈🥉]\s+(\S+)\s+\|\s+([\d.]+)\s+\|\s+[\d.]+x\s+\|\s+([\d.]+)\s+KB/ms'
+                results[lib_name] = [BenchmarkResult(
+                    parser="Harmonica",
+                    language="Java",
+                    avg_time_ms=avg_time,
+                    throughput_kb_ms=throughput
+                )]
+
+    return results
 
-    # Find all library positions
-    lib_matches = list(re.finditer(library_pattern, content))
 
-    for i, lib_match in enumerate(lib_matches):
-        lib_name = lib_match.group(1).strip()
-        lib_name = normalize_library_name(lib_name)
+def parse_javascript_results(filepath: str) -> Dict[str, List[BenchmarkResult]]:
+    """Parse JavaScript benchmark results file."""
+    results = {}
 
-        # Get the section between this library and the next (or end)
-        start = lib_match.end()
-        end = lib_matches[i + 1].start() if i + 1 < len(lib_matches) else len(content)
-        section = content[start:end]
+    with _map_results_file(filepath) as content:
+        if content is None:
+            return results
 
+        current_library = None
         lib_results = []
-        for result_match in re.finditer(result_pattern, section):
-            parser = result_match.group(1).strip()
-            avg_time = float(result_match.group(2))
-            throughput = float(result_match.group(3))
+
+        # Single pass: track the current library header and collect medal-prefixed result lines
+        for line in _iter_lines(content):
+            if line.startswith(b'Library:'):
+                lib_name = line.partition(b'Library:')[2].strip().decode()
+                current_library = normalize_library_name(lib_name)
+                lib_results = []
+                continue
+
+            line = line.lstrip()
+            if not current_library or not line.startswith(_MEDALS):
+                continue
+
+            # e.g. 🥇 Meriyah            |           0.295 |            1.00x |         35.5 KB/ms
+            try:
+                parts = line.split(b'|')
+                parser = sys.intern(parts[0].split(maxsplit=1)[1].strip().decode())
+                avg_time = float(parts[1])
+                # Throughput column reads e.g. '35.5 KB/ms'
+                throughput = float(parts[3].split()[0])
+            except (IndexError, ValueError):
+                result_match = _JS_RESULT_RE.search(line)
+                if not result_match:
+                    continue
+                parser = sys.intern(result_match.group(1).strip().decode())
+                avg_time = float(result_match.group(2))
+                throughput = float(result_match.group(3))
 
             lib_results.append(BenchmarkResult(
                 parser=parser,
@@ -112,9 +224,7 @@ def parse_javascript_results(filepath: str) -> Dict[str, List[BenchmarkResult]]:
                 avg_time_ms=avg_time,
                 throughput_kb_ms=throughput
             ))
-
-        if lib_results:
-            results[lib_name] = lib_results
+            results[current_library] = lib_results
 
     return results
 
@@ -123,36 +233,42 @@ def parse_rust_results(filepath: str) -> Dict[str, List[BenchmarkResult]]:
     """Parse Rust benchmark results file."""
     results = {}
 
-    try:
-        with open(filepath, 'r') as f:
-            content = f.read()
-    except FileNotFoundError:
-        return results
+    with _map_results_file(filepath) as content:
+        if content is None:
+            return results
 
-    # Find each library section
-    library_pattern = r'Library: (.+?)\nSize: ([\d.]+) KB'
-    # Match parser results like: 🥇 OXC (Rust)         |           0.138 |            1.00x |                 76.2
-    result_pattern = r'[🥇🥈🥉]\s+(.+?)\s+\|\s+([\d.]+)\s+\|\s+[\d.]+x\s+\|\s+([\d.]+)'
-
-    # Find all library positions
-    lib_matches = list(re.finditer(library_pattern, content))
-
-    for i, lib_match in enumerate(lib_matches):
-        lib_name = lib_match.group(1).strip()
-        lib_name = normalize_library_name(lib_name)
+        current_library = None
+        lib_results = []
 
-        # Get the section between this library and the next (or end)
-        start = lib_match.end()
-        end = lib_matches[i + 1].start() if i + 1 < len(lib_matches) else len(content)
-        section = content[start:end]
+        # Single pass: track the current library header and collect medal-prefixed result lines
+        for line in _iter_lines(content):
+            if line.startswith(b'Library:'):
+                lib_name = line.partition(b'Library:')[2].strip().decode()
+                current_library = normalize_library_name(lib_name)
+                lib_results = []
+                continue
+
+            line = line.lstrip()
+            if not current_library or not line.startswith(_MEDALS):
+                continue
+
+            # e.g. 🥇 OXC (Rust)         |           0.138 |            1.00x |                 76.2
+            try:
+                parts = line.split(b'|')
+                parser = parts[0].split(maxsplit=1)[1].strip().decode()
+                avg_time = float(parts[1])
+                # Throughput column reads e.g. '76.2' (no unit, unlike the JS output)
+                throughput = float(parts[3].split()[0])
+            except (IndexError, ValueError):
+                result_match = _RUST_RESULT_RE.search(line)
+                if not result_match:
+                    continue
+                parser = result_match.group(1).strip().decode()
+                avg_time = float(result_match.group(2))
+                throughput = float(result_match.group(3))
 
-        lib_results = []
-        for result_match in re.finditer(result_pattern, section):
-            parser = result_match.group(1).strip()
             # Simplify parser names
-            parser = parser.replace(' (Rust)', '')
-            avg_time = float(result_match.group(2))
-            throughput = float(result_match.group(3))
+            parser = sys.intern(parser.replace(' (Rust)', ''))
 
             lib_results.append(BenchmarkResult(
                 parser=parser,
@@ -160,9 +276,55 @@ def parse_rust_results(filepath: str) -> Dict[str, List[BenchmarkResult]]:
                 avg_time_ms=avg_time,
                 throughput_kb_ms=throughput
             ))
+            results[current_library] = lib_results
 
-        if lib_results:
-            results[lib_name] = lib_results
+    return results
+
+
+def _cached_parse(filepath: str, parser_fn: Callable[[str], Dict[str, List[BenchmarkResult]]],
+                  cache_dir: Optional[str]) -> Dict[str, List[BenchmarkResult]]:
+    """Run parser_fn on filepath, reusing the cached result while the file and _CACHE_VERSION are unchanged.
+
+    Caching is best-effort: an unreadable entry is re-parsed and a failed write is ignored.
+    """
+    if cache_dir is None:
+        return parser_fn(filepath)
+
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return parser_fn(filepath)
+
+    # One entry per parser, holding the latest file it parsed and overwritten in place
+    # whenever that file, the input path or _CACHE_VERSION changes
+    cache_file = Path(cache_dir) / f'{parser_fn.__name__}.pkl'
+    stamp = (_CACHE_VERSION, os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+
+    try:
+        cached_stamp, cached_results = pickle.loads(cache_file.read_bytes())
+        if cached_stamp == stamp:
+            return cached_results
+    except Exception:
+        pass  # Missing, outdated or corrupt entry - parse again and overwrite it
+
+    results = parser_fn(filepath)
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_file.parent, prefix=cache_file.stem, suffix='.tmp')
+    except OSError:
+        return results
+
+    try:
+        # Write to a temp file and swap it in so an interrupted run never leaves a partial pickle
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((stamp, results), f)
+        os.replace(tmp_path, cache_file)
+    except (OSError, pickle.PicklingError):
+        pass
+    finally:
+        with suppress(OSError):
+            os.unlink(tmp_path)
 
     return results
 
@@ -184,224 +346,225 @@ def find_latest_results(results_dir: str) -> Tuple[str, str, str]:
     """Find the latest benchmark result files."""
     results_path = Path(results_dir)
 
-    java_files = sorted(results_path.glob('java_*.txt'), reverse=True)
-    js_files = sorted(results_path.glob('js_*.txt'), reverse=True)
-    rust_files = sorted(results_path.glob('rust_*.txt'), reverse=True)
+    # Latest file by name (timestamped), skipping realworld files - we want the regular ones
+    java_file = max((f for f in results_path.glob('java_*.txt')
+                     if 'realworld' not in f.name and 'our_parser' not in f.name),
+                    key=lambda f: f.name, default=None)
+    js_file = max((f for f in results_path.glob('js_*.txt') if 'realworld' not in f.name),
+                  key=lambda f: f.name, default=None)
+    rust_file = max((f for f in results_path.glob('rust_*.txt') if 'realworld' not in f.name),
+                    key=lambda f: f.name, default=None)
 
-    # Filter out realworld files for this purpose, we want the regular ones
-    java_files = [f for f in java_files if 'realworld' not in f.name and 'our_parser' not in f.name]
-    js_files = [f for f in js_files if 'realworld' not in f.name]
-    rust_files = [f for f in rust_files if 'realworld' not in f.name]
-
-    java_file = str(java_files[0]) if java_files else None
-    js_file = str(js_files[0]) if js_files else None
-    rust_file = str(rust_files[0]) if rust_files else None
+    java_file = str(java_file) if java_file else None
+    js_file = str(js_file) if js_file else None
+    rust_file = str(rust_file) if rust_file else None
 
     return java_file, js_file, rust_file
 
 
 def merge_results(java_results: Dict, js_results: Dict, rust_results: Dict) -> Dict[str, List[BenchmarkResult]]:
     """Merge results from all languages into a single structure."""
-    all_libraries = set(java_results.keys()) | set(js_results.keys()) | set(rust_results.keys())
-
-    merged = {}
-    for lib in all_libraries:
-        merged[lib] = []
-        if lib in java_results:
-            merged[lib].extend(java_results[lib])
-        if lib in js_results:
-            merged[lib].extend(js_results[lib])
-        if lib in rust_results:
-            merged[lib].extend(rust_results[lib])
+    merged = defaultdict(list)
+    for language_results in (java_results, js_results, rust_results):
+        for lib, lib_results in language_results.items():
+            merged[lib].extend(lib_results)
 
-    return merged
+    return dict(merged)
 
 
 def get_language_color(language: str) -> str:
     """Get color for a language."""
-    colors = {
-        'Rust': '#dea584',      # Rust orange
-        'JavaScript': '#f7df1e', # JS yellow
-        'Java': '#5382a1',       # Java blue
-    }
-    return colors.get(language, '#888888')
+    return _LANGUAGE_COLORS.get(language, '#888888')
 
 
 def get_parser_color(parser: str, language: str) -> str:
     """Get color for a specific parser."""
-    colors = {
-        # Rust parsers - orange tones
-        'OXC': '#e07020',
-        'SWC': '#ff9955',
-        # JavaScript parsers - yellow/green tones
-        'Meriyah': '#2d9f2d',
-        'Acorn': '#7cb342',
-        '@babel/parser': '#f5da55',
-        # Java parsers - blue tones
-        'Harmonica': '#1e88e5',
-    }
-    return colors.get(parser, get_language_color(language))
+    return _PARSER_COLORS.get(parser) or get_language_color(language)
 
 
-def create_time_comparison_chart(results: Dict[str, List[BenchmarkResult]], output_path: str):
-    """Create a grouped bar chart comparing parsing times."""
-    # Order libraries by size (smallest to largest)
-    library_order = ['React', 'Vue 3', 'React DOM', 'Lodash', 'Three.js', 'TypeScript Compiler']
-    libraries = [lib for lib in library_order if lib in results]
+def _pivot(results: Dict[str, List[BenchmarkResult]]) -> Dict[Tuple[str, str], BenchmarkResult]:
+    """Index results by (library, parser) for constant-time lookup."""
+    pivot = {}
+    for lib, lib_results in results.items():
+        for r in lib_results:
+            pivot.setdefault((lib, r.parser), r)
+    return pivot
+
 
-    # Get all unique parsers and their languages
-    all_parsers = set()
+def _order_parsers(results: Dict[str, List[BenchmarkResult]]) -> Tuple[List[str], Dict[str, str]]:
+    """Get all unique parsers and their languages, ordered Rust first, then JS, then Java."""
     parser_language = {}
     for lib_results in results.values():
         for r in lib_results:
-            all_parsers.add(r.parser)
             parser_language[r.parser] = r.language
 
-    # Order parsers: Rust first, then JS, then Java
     language_order = {'Rust': 0, 'JavaScript': 1, 'Java': 2}
-    parsers = sorted(all_parsers, key=lambda p: (language_order.get(parser_language.get(p, 'Other'), 3), p))
+    parsers = sorted(parser_language, key=lambda p: (language_order.get(parser_language[p], 3), p))
+    return parsers, parser_language
+
+
+def build_chart_context(results: Dict[str, List[BenchmarkResult]]) -> ChartContext:
+    """Compute the library/parser layout shared by the grouped bar charts."""
+    parsers, parser_language = _order_parsers(results)
+    libraries = [lib for lib in _LIBRARY_ORDER if lib in results]
+    x = _X_POSITIONS[:len(libraries)]
+    return ChartContext(
+        libraries=libraries,
+        parsers=parsers,
+        parser_language=parser_language,
+        pivot=_pivot(results),
+        x=x,
+        # Center each library's tick under its group of bars
+        xticks=x + _BAR_WIDTH * (len(parsers) - 1) / 2
+    )
+
+
+def _reset_figure(fig: Optional[Figure], figsize: Tuple[float, float]) -> Figure:
+    """Clear and resize fig for the next chart, or create a new figure if none was given."""
+    if fig is None:
+        return plt.figure(figsize=figsize, layout='constrained')
+    fig.clear()
+    fig.set_size_inches(figsize)
+    fig.set_layout_engine('constrained')
+    return fig
+
+
+def create_time_comparison_chart(ctx: ChartContext, output_path: str, fig: Optional[Figure] = None,
+                                 dpi: int = _DEFAULT_DPI):
+    """Create a grouped bar chart comparing parsing times."""
+    libraries = ctx.libraries
+    parsers = ctx.parsers
+    parser_language = ctx.parser_language
+    pivot = ctx.pivot
 
     # Setup the plot
-    fig, ax = plt.subplots(figsize=(14, 8))
+    owns_fig = fig is None
+    fig = _reset_figure(fig, (14, 8))
+    ax = fig.subplots()
 
-    x = np.arange(len(libraries))
-    width = 0.12
-    multiplier = 0
+    x = ctx.x
+    width = _BAR_WIDTH
 
-    for parser in parsers:
-        times = []
-        for lib in libraries:
-            lib_results = results.get(lib, [])
-            parser_result = next((r for r in lib_results if r.parser == parser), None)
-            times.append(parser_result.avg_time_ms if parser_result else 0)
+    # One row of bar heights per parser, one column per library
+    data = np.zeros((len(parsers), len(libraries)), dtype=np.float64)
+    for i, parser in enumerate(parsers):
+        for j, lib in enumerate(libraries):
+            parser_result = pivot.get((lib, parser))
+            data[i, j] = parser_result.avg_time_ms if parser_result else 0
 
-        offset = width * multiplier
+    for i, parser in enumerate(parsers):
         color = get_parser_color(parser, parser_language.get(parser, 'Other'))
-        bars = ax.bar(x + offset, times, width, label=parser, color=color, edgecolor='black', linewidth=0.5)
-        multiplier += 1
+        ax.bar(x + width * i, data[i], width, label=parser, color=color, edgecolor='black', linewidth=0.5)
 
     # Customize the plot
     ax.set_ylabel('Parsing Time (ms)', fontsize=12)
     ax.set_xlabel('JavaScript Library', fontsize=12)
     ax.set_title('JavaScript Parser Performance Comparison\n(Lower is Better)', fontsize=14, fontweight='bold')
-    ax.set_xticks(x + width * (len(parsers) - 1) / 2)
+    ax.set_xticks(ctx.xticks)
     ax.set_xticklabels(libraries, rotation=15, ha='right')
     ax.legend(loc='upper left', ncols=2)
     ax.set_yscale('log')
     ax.grid(axis='y', alpha=0.3)
     ax.set_axisbelow(True)
 
-    # Add language legend
-    rust_patch = mpatches.Patch(color='#dea584', label='Rust')
-    js_patch = mpatches.Patch(color='#90b040', label='JavaScript')
-    java_patch = mpatches.Patch(color='#5382a1', label='Java')
-
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    fig.savefig(output_path, dpi=dpi)
     print(f"Saved: {output_path}")
-    plt.close()
+    if owns_fig:
+        plt.close(fig)
 
 
-def create_throughput_comparison_chart(results: Dict[str, List[BenchmarkResult]], output_path: str):
+def create_throughput_comparison_chart(ctx: ChartContext, output_path: str, fig: Optional[Figure] = None,
+                                       dpi: int = _DEFAULT_DPI):
     """Create a grouped bar chart comparing throughput."""
-    # Order libraries by size
-    library_order = ['React', 'Vue 3', 'React DOM', 'Lodash', 'Three.js', 'TypeScript Compiler']
-    libraries = [lib for lib in library_order if lib in results]
-
-    # Get all unique parsers
-    all_parsers = set()
-    parser_language = {}
-    for lib_results in results.values():
-        for r in lib_results:
-            all_parsers.add(r.parser)
-            parser_language[r.parser] = r.language
-
-    # Order parsers
-    language_order = {'Rust': 0, 'JavaScript': 1, 'Java': 2}
-    parsers = sorted(all_parsers, key=lambda p: (language_order.get(parser_language.get(p, 'Other'), 3), p))
+    libraries = ctx.libraries
+    parsers = ctx.parsers
+    parser_language = ctx.parser_language
+    pivot = ctx.pivot
 
     # Setup the plot
-    fig, ax = plt.subplots(figsize=(14, 8))
+    owns_fig = fig is None
+    fig = _reset_figure(fig, (14, 8))
+    ax = fig.subplots()
 
-    x = np.arange(len(libraries))
-    width = 0.12
-    multiplier = 0
+    x = ctx.x
+    width = _BAR_WIDTH
 
-    for parser in parsers:
-        throughputs = []
-        for lib in libraries:
-            lib_results = results.get(lib, [])
-            parser_result = next((r for r in lib_results if r.parser == parser), None)
-            throughputs.append(parser_result.throughput_kb_ms if parser_result else 0)
+    # One row of bar heights per parser, one column per library
+    data = np.zeros((len(parsers), len(libraries)), dtype=np.float64)
+    for i, parser in enumerate(parsers):
+        for j, lib in enumerate(libraries):
+            parser_result = pivot.get((lib, parser))
+            data[i, j] = parser_result.throughput_kb_ms if parser_result else 0
 
-        offset = width * multiplier
+    for i, parser in enumerate(parsers):
         color = get_parser_color(parser, parser_language.get(parser, 'Other'))
-        bars = ax.bar(x + offset, throughputs, width, label=parser, color=color, edgecolor='black', linewidth=0.5)
-        multiplier += 1
+        ax.bar(x + width * i, data[i], width, label=parser, color=color, edgecolor='black', linewidth=0.5)
 
     # Customize the plot
     ax.set_ylabel('Throughput (KB/ms)', fontsize=12)
     ax.set_xlabel('JavaScript Library', fontsize=12)
     ax.set_title('JavaScript Parser Throughput Comparison\n(Higher is Better)', fontsize=14, fontweight='bold')
-    ax.set_xticks(x + width * (len(parsers) - 1) / 2)
+    ax.set_xticks(ctx.xticks)
     ax.set_xticklabels(libraries, rotation=15, ha='right')
     ax.legend(loc='upper left', ncols=2)
     ax.grid(axis='y', alpha=0.3)
     ax.set_axisbelow(True)
 
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    fig.savefig(output_path, dpi=dpi)
     print(f"Saved: {output_path}")
-    plt.close()
+    if owns_fig:
+        plt.close(fig)
 
 
-def create_per_library_charts(results: Dict[str, List[BenchmarkResult]], output_dir: str):
-    """Create individual bar charts for each library."""
-    os.makedirs(output_dir, exist_ok=True)
+def _render_library_chart(lib: str, lib_results: List[BenchmarkResult], output_dir: str,
+                          dpi: int = _DEFAULT_DPI) -> str:
+    """Render one library's parser comparison chart and return the saved path."""
+    # Sort by time (fastest first)
+    lib_results_sorted = sorted(lib_results, key=lambda r: r.avg_time_ms)
 
-    library_order = ['React', 'Vue 3', 'React DOM', 'Lodash', 'Three.js', 'TypeScript Compiler']
+    parsers = [r.parser for r in lib_results_sorted]
+    times = [r.avg_time_ms for r in lib_results_sorted]
+    colors = [get_parser_color(r.parser, r.language) for r in lib_results_sorted]
 
-    for lib in library_order:
-        if lib not in results:
-            continue
+    # A standalone Figure keeps this off pyplot's global state so it can run on a worker thread
+    fig = Figure(figsize=(10, 6), layout='constrained')
+    ax = fig.subplots()
 
-        lib_results = results[lib]
+    bars = ax.barh(parsers, times, color=colors, edgecolor='black', linewidth=0.5)
 
-        # Sort by time (fastest first)
-        lib_results_sorted = sorted(lib_results, key=lambda r: r.avg_time_ms)
+    # Add time labels on bars
+    ax.bar_label(bars, labels=[f'{t:.2f} ms' for t in times], padding=3, fontsize=10)
 
-        parsers = [r.parser for r in lib_results_sorted]
-        times = [r.avg_time_ms for r in lib_results_sorted]
-        colors = [get_parser_color(r.parser, r.language) for r in lib_results_sorted]
+    ax.set_xlabel('Parsing Time (ms)', fontsize=12)
+    ax.set_title(f'Parser Performance: {lib}\n(Lower is Better)', fontsize=14, fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(axis='x', alpha=0.3)
+    ax.set_axisbelow(True)
 
-        fig, ax = plt.subplots(figsize=(10, 6))
+    # Extend x-axis to fit labels
+    ax.set_xlim(0, max(times) * 1.25)
 
-        bars = ax.barh(parsers, times, color=colors, edgecolor='black', linewidth=0.5)
+    safe_name = lib.lower().replace(' ', '_').replace('.', '')
+    output_path = os.path.join(output_dir, f'{safe_name}_comparison.png')
+    fig.savefig(output_path, dpi=dpi)
+    return output_path
 
-        # Add time labels on bars
-        for bar, time in zip(bars, times):
-            width = bar.get_width()
-            ax.text(width + max(times) * 0.02, bar.get_y() + bar.get_height()/2,
-                   f'{time:.2f} ms', va='center', fontsize=10)
 
-        ax.set_xlabel('Parsing Time (ms)', fontsize=12)
-        ax.set_title(f'Parser Performance: {lib}\n(Lower is Better)', fontsize=14, fontweight='bold')
-        ax.invert_yaxis()
-        ax.grid(axis='x', alpha=0.3)
-        ax.set_axisbelow(True)
+def create_per_library_charts(results: Dict[str, List[BenchmarkResult]], output_dir: str,
+                              dpi: int = _DEFAULT_DPI):
+    """Create individual bar charts for each library, rendering them concurrently."""
+    os.makedirs(output_dir, exist_ok=True)
 
-        # Extend x-axis to fit labels
-        ax.set_xlim(0, max(times) * 1.25)
+    libraries = [lib for lib in _LIBRARY_ORDER if lib in results]
 
-        plt.tight_layout()
-        safe_name = lib.lower().replace(' ', '_').replace('.', '')
-        output_path = os.path.join(output_dir, f'{safe_name}_comparison.png')
-        plt.savefig(output_path, dpi=150, bbox_inches='tight')
-        print(f"Saved: {output_path}")
-        plt.close()
+    with ThreadPoolExecutor() as executor:
+        futures = [executor.submit(_render_library_chart, lib, results[lib], output_dir, dpi) for lib in libraries]
+        for future in as_completed(futures):
+            print(f"Saved: {future.result()}")
 
 
-def create_typescript_focused_chart(results: Dict[str, List[BenchmarkResult]], output_path: str):
+def create_typescript_focused_chart(results: Dict[str, List[BenchmarkResult]], output_path: str,
+                                    fig: Optional[Figure] = None, dpi: int = _DEFAULT_DPI):
     """Create a focused chart for TypeScript (the largest benchmark)."""
     if 'TypeScript Compiler' not in results:
         return
@@ -413,14 +576,13 @@ def create_typescript_focused_chart(results: Dict[str, List[BenchmarkResult]], o
     throughputs = [r.throughput_kb_ms for r in lib_results]
     colors = [get_parser_color(r.parser, r.language) for r in lib_results]
 
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    owns_fig = fig is None
+    fig = _reset_figure(fig, (14, 6))
+    ax1, ax2 = fig.subplots(1, 2)
 
     # Time comparison
     bars1 = ax1.barh(parsers, times, color=colors, edgecolor='black', linewidth=0.5)
-    for bar, time in zip(bars1, times):
-        width = bar.get_width()
-        ax1.text(width + max(times) * 0.02, bar.get_y() + bar.get_height()/2,
-                f'{time:.1f} ms', va='center', fontsize=10)
+    ax1.bar_label(bars1, labels=[f'{t:.1f} ms' for t in times], padding=3, fontsize=10)
     ax1.set_xlabel('Parsing Time (ms)', fontsize=12)
     ax1.set_title('Parsing Time (Lower is Better)', fontsize=12, fontweight='bold')
     ax1.invert_yaxis()
@@ -429,10 +591,7 @@ def create_typescript_focused_chart(results: Dict[str, List[BenchmarkResult]], o
 
     # Throughput comparison
     bars2 = ax2.barh(parsers, throughputs, color=colors, edgecolor='black', linewidth=0.5)
-    for bar, tp in zip(bars2, throughputs):
-        width = bar.get_width()
-        ax2.text(width + max(throughputs) * 0.02, bar.get_y() + bar.get_height()/2,
-                f'{tp:.1f} KB/ms', va='center', fontsize=10)
+    ax2.bar_label(bars2, labels=[f'{tp:.1f} KB/ms' for tp in throughputs], padding=3, fontsize=10)
     ax2.set_xlabel('Throughput (KB/ms)', fontsize=12)
     ax2.set_title('Throughput (Higher is Better)', fontsize=12, fontweight='bold')
     ax2.invert_yaxis()
@@ -441,14 +600,21 @@ def create_typescript_focused_chart(results: Dict[str, List[BenchmarkResult]], o
 
     fig.suptitle('TypeScript Compiler (8.8 MB) - Parser Performance', fontsize=14, fontweight='bold')
 
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    fig.savefig(output_path, dpi=dpi)
     print(f"Saved: {output_path}")
-    plt.close()
+    if owns_fig:
+        plt.close(fig)
 
 
 def main():
     """Main function to generate benchmark graphs."""
+    arg_parser = argparse.ArgumentParser(description='Generate graphs from cross-language parser benchmarks.')
+    arg_parser.add_argument('--dpi', type=int, default=_DEFAULT_DPI,
+                            help=f'Resolution of the generated PNGs (default: {_DEFAULT_DPI})')
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help='Re-parse result files even if a cached parse is up to date')
+    args = arg_parser.parse_args()
+
     # Find the project root (where benchmark-results directory is)
     script_dir = Path(__file__).parent
     project_root = script_dir.parent
@@ -473,9 +639,10 @@ def main():
     print()
 
     # Parse results
-    java_results = parse_java_results(java_file) if java_file else {}
-    js_results = parse_javascript_results(js_file) if js_file else {}
-    rust_results = parse_rust_results(rust_file) if rust_file else {}
+    cache_dir = None if args.no_cache else str(results_dir / '.cache')
+    java_results = _cached_parse(java_file, parse_java_results, cache_dir) if java_file else {}
+    js_results = _cached_parse(js_file, parse_javascript_results, cache_dir) if js_file else {}
+    rust_results = _cached_parse(rust_file, parse_rust_results, cache_dir) if rust_file else {}
 
     if not any([java_results, js_results, rust_results]):
         print("Error: No benchmark results found!")
@@ -493,15 +660,21 @@ def main():
     # Generate graphs
     print("Generating graphs...")
 
+    # One figure is cleared and reused for every chart
+    fig = plt.figure(figsize=(14, 8), layout='constrained')
+
     # Main comparison charts
-    create_time_comparison_chart(all_results, str(output_dir / 'parsing_time_comparison.png'))
-    create_throughput_comparison_chart(all_results, str(output_dir / 'throughput_comparison.png'))
+    ctx = build_chart_context(all_results)
+    create_time_comparison_chart(ctx, str(output_dir / 'parsing_time_comparison.png'), fig, args.dpi)
+    create_throughput_comparison_chart(ctx, str(output_dir / 'throughput_comparison.png'), fig, args.dpi)
 
     # Per-library charts
-    create_per_library_charts(all_results, str(output_dir / 'per_library'))
+    create_per_library_charts(all_results, str(output_dir / 'per_library'), args.dpi)
 
     # TypeScript focused chart
-    create_typescript_focused_chart(all_results, str(output_dir / 'typescript_detailed.png'))
+    create_typescript_focused_chart(all_results, str(output_dir / 'typescript_detailed.png'), fig, args.dpi)
+
+    plt.close(fig)
 
     print()
     print(f"All graphs saved to: {output_dir}")